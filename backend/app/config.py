@@ -10,6 +10,9 @@ class Settings(BaseSettings):
     FRONTEND_URL: str = "http://localhost:5173"
     SECRET_KEY: str = "change-me-in-production"
     SECURE_COOKIES: bool = False  # Set True when serving over HTTPS in production
+    JOURNAL_DIR: str = "journal"  # Where delete journals are written for undo
+    RESULT_CACHE_MAX_ENTRIES: int = 256
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
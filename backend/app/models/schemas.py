@@ -37,6 +37,30 @@ class DeleteRequest(BaseModel):
 class DeleteResult(BaseModel):
     deleted: List[str]
     failed: List[dict]
+    batch_id: Optional[str] = None  # journal batch to pass to /restore
+    journal_error: Optional[str] = None
+
+
+class JournalBatch(BaseModel):
+    batch_id: str
+    deleted_at: datetime
+    deleted_count: int = 0
+    deleted_size: int = 0
+    restored_count: int = 0
+
+
+class RestoreRequest(BaseModel):
+    batch_id: str
+    file_ids: Optional[List[str]] = None  # defaults to every pending file in the batch
+
+
+class RestoreStatus(BaseModel):
+    status: str  # "idle" | "restoring" | "complete" | "error"
+    batch_id: Optional[str] = None
+    total: int = 0
+    restored: int = 0
+    failed: List[dict] = []
+    message: Optional[str] = None
 
 
 class UserInfo(BaseModel):
@@ -51,6 +75,13 @@ class DuplicatesFilter(BaseModel):
     folder_path: Optional[str] = None
 
 
+class KeepRules(BaseModel):
+    preferred_folder: Optional[str] = None
+    avoid_copy_names: bool = False
+    preferred_mime_type: Optional[str] = None
+    prefer_shortest_path: bool = False
+
+
 class DashboardStats(BaseModel):
     total_files: int
     duplicate_groups: int
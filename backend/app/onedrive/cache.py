@@ -0,0 +1,83 @@
+import hashlib
+import itertools
+import uuid
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from app.config import settings
+from app.models.schemas import DuplicatesFilter, KeepRules
+
+# Generations come from one process-wide counter so a fresh scan never reuses
+# a number; the boot ID keeps ETags from matching across restarts.
+_generations = itertools.count(1)
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def next_generation() -> int:
+    return next(_generations)
+
+
+def filter_key(filters: Optional[DuplicatesFilter], rules: Optional[KeepRules] = None) -> Tuple[Hashable, ...]:
+    """Normalise filters (and keep rules) into a hashable cache key.
+
+    Equivalent requests such as ``extensions=JPG,.png`` and ``extensions=png,jpg``
+    map to the same key.
+    """
+    min_size = 0
+    extensions: Optional[Tuple[str, ...]] = None
+    folder_path: Optional[str] = None
+    if filters:
+        min_size = filters.min_size or 0
+        # Mirror DuplicateDetector._passes_filter exactly: the key must never
+        # treat two filters as equal when they select different groups
+        if filters.extensions:
+            extensions = tuple(sorted({e.lower().lstrip(".") for e in filters.extensions}))
+        if filters.folder_path:
+            folder_path = filters.folder_path.rstrip("/")
+    rules_key = rules.model_dump_json() if rules else None
+    return (min_size, extensions, folder_path, rules_key)
+
+
+class ResultCache:
+    """LRU cache of rendered JSON responses, bounded by entry count and bytes.
+
+    Keys include the session's scan generation, so stale results are never
+    served; they simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[Hashable, ...], bytes]" = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def etag(key: Tuple[Hashable, ...]) -> str:
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:24]
+        return f'"{_BOOT_ID}-{digest}"'
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def put(self, key: Tuple[Hashable, ...], body: bytes) -> None:
+        if len(body) > self._max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = body
+        self._size += len(body)
+        while len(self._entries) > self._max_entries or self._size > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def invalidate(self, store_key: str) -> None:
+        """Drop every cached result for one session (keys start with the store key)."""
+        for key in [k for k in self._entries if k[0] == store_key]:
+            self._size -= len(self._entries.pop(key))
+
+
+result_cache = ResultCache(settings.RESULT_CACHE_MAX_ENTRIES, settings.RESULT_CACHE_MAX_BYTES)
@@ -1,7 +1,64 @@
 from collections import defaultdict
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set
 
-from app.models.schemas import DashboardStats, DuplicateGroup, DuplicatesFilter, FileInfo
+from app.models.schemas import DashboardStats, DuplicateGroup, DuplicatesFilter, FileInfo, KeepRules
+from app.onedrive.keep_rules import KeepRuleEngine
+
+
+class KeepIndex:
+    """Lookup of the suggested keep copy for every duplicate group.
+
+    Built once from the unfiltered duplicate groups so delete requests can
+    work out which files to protect without regrouping the whole scan.
+    """
+
+    def __init__(self, duplicates: List[DuplicateGroup]) -> None:
+        self.keep_ids: Set[str] = {g.suggested_keep_id for g in duplicates}
+        self._hash_by_id: Dict[str, str] = {}
+        self._ids_by_hash: Dict[str, Set[str]] = {}
+        self._keep_by_hash: Dict[str, str] = {}
+        for group in duplicates:
+            self._ids_by_hash[group.hash] = {f.id for f in group.files}
+            self._keep_by_hash[group.hash] = group.suggested_keep_id
+            for f in group.files:
+                self._hash_by_id[f.id] = group.hash
+
+    def protected_ids(self, file_ids: Iterable[str]) -> Set[str]:
+        """Return keep IDs of groups in which every copy is being deleted."""
+        requested: Dict[str, Set[str]] = defaultdict(set)
+        for file_id in file_ids:
+            file_hash = self._hash_by_id.get(file_id)
+            if file_hash is not None:
+                requested[file_hash].add(file_id)
+
+        return {
+            self._keep_by_hash[file_hash]
+            for file_hash, ids in requested.items()
+            if len(ids) >= len(self._ids_by_hash[file_hash])
+        }
+
+    def discard(self, deleted_ids: Iterable[str]) -> bool:
+        """Drop deleted files from the index.
+
+        Returns False when a suggested keep copy was deleted, in which case the
+        index no longer reflects the rules and must be rebuilt.
+        """
+        valid = True
+        for file_id in deleted_ids:
+            file_hash = self._hash_by_id.pop(file_id, None)
+            if file_hash is None:
+                continue
+            if file_id in self.keep_ids:
+                valid = False
+            remaining = self._ids_by_hash[file_hash]
+            remaining.discard(file_id)
+            if len(remaining) < 2:
+                # No longer a duplicate group; the remaining copy is unique
+                self.keep_ids.discard(self._keep_by_hash.pop(file_hash))
+                for other_id in remaining:
+                    del self._hash_by_id[other_id]
+                del self._ids_by_hash[file_hash]
+        return valid
 
 
 class DuplicateDetector:
@@ -9,6 +66,7 @@ class DuplicateDetector:
     def find_duplicates(
         files: List[FileInfo],
         filters: Optional[DuplicatesFilter] = None,
+        keep_rules: Optional[KeepRules] = None,
     ) -> List[DuplicateGroup]:
         # Group files by hash, ignoring files without a hash
         groups: Dict[str, List[FileInfo]] = defaultdict(list)
@@ -16,22 +74,28 @@ class DuplicateDetector:
             if f.hash:
                 groups[f.hash].append(f)
 
-        result: List[DuplicateGroup] = []
-        for file_hash, file_list in groups.items():
-            if len(file_list) < 2:
-                continue
+        # Sort each group oldest first for display
+        candidates = [
+            (file_hash, sorted(file_list, key=lambda f: f.last_modified))
+            for file_hash, file_list in groups.items()
+            if len(file_list) >= 2
+        ]
+
+        # Score all groups in one batch to pick the suggested keep copies
+        engine = KeepRuleEngine.from_config(keep_rules)
+        keep_files = engine.select_keep([file_list for _, file_list in candidates])
 
-            # Sort oldest first; keep oldest as suggested copy
-            sorted_files = sorted(file_list, key=lambda f: f.last_modified)
+        result: List[DuplicateGroup] = []
+        for (file_hash, sorted_files), keep in zip(candidates, keep_files):
             total_size = sum(f.size for f in sorted_files)
-            reclaimable = total_size - sorted_files[0].size  # keep one copy
+            reclaimable = total_size - keep.size  # keep one copy
 
             group = DuplicateGroup(
                 hash=file_hash,
                 files=sorted_files,
                 total_size=total_size,
                 reclaimable_size=reclaimable,
-                suggested_keep_id=sorted_files[0].id,
+                suggested_keep_id=keep.id,
             )
 
             if filters and not DuplicateDetector._passes_filter(group, filters):
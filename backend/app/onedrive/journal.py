@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.models.schemas import FileInfo, JournalBatch
+
+logger = logging.getLogger(__name__)
+
+_write_lock = threading.Lock()
+
+
+class DeleteJournal:
+    """Append-only local record of deleted files, one JSON object per line.
+
+    Each delete batch appends one ``delete`` record per file *before* the files
+    are deleted, holding the full ``FileInfo`` (including its original
+    ``parent_id``). Files that end up not being deleted get an ``abort`` record
+    afterwards, and restores append ``restore`` records, so a crash mid-delete
+    still leaves every deleted file in the journal.
+
+    File I/O runs in a worker thread so it never blocks the event loop.
+    """
+
+    def __init__(self, owner: str, journal_dir: Optional[str] = None) -> None:
+        # Hash the owner so arbitrary IDs make safe file names
+        digest = hashlib.sha256(owner.encode("utf-8")).hexdigest()[:32]
+        self._path = os.path.join(journal_dir or settings.JOURNAL_DIR, f"{digest}.jsonl")
+
+    async def record_deleting(self, files: List[FileInfo]) -> Optional[str]:
+        """Append a delete batch ahead of deleting and return its ID (None if empty)."""
+        if not files:
+            return None
+        batch_id = uuid.uuid4().hex
+        timestamp = datetime.now(timezone.utc).isoformat()
+        await self._append(
+            [
+                {"op": "delete", "batch_id": batch_id, "timestamp": timestamp, "file": f.model_dump(mode="json")}
+                for f in files
+            ]
+        )
+        return batch_id
+
+    async def record_aborted(self, batch_id: str, file_ids: List[str]) -> None:
+        """Mark files from a delete batch that were not actually deleted."""
+        await self._append_ops("abort", batch_id, file_ids)
+
+    async def record_restored(self, batch_id: str, file_ids: List[str]) -> None:
+        await self._append_ops("restore", batch_id, file_ids)
+
+    async def list_batches(self) -> List[JournalBatch]:
+        """Summarise delete batches, newest first."""
+        return await asyncio.to_thread(self._list_batches)
+
+    async def pending_restore(self, batch_id: str, file_ids: Optional[List[str]] = None) -> List[FileInfo]:
+        """Return files from a batch that are deleted and not yet restored."""
+        return await asyncio.to_thread(self._pending_restore, batch_id, file_ids)
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    def _list_batches(self) -> List[JournalBatch]:
+        batches: Dict[str, JournalBatch] = {}
+        sizes: Dict[Tuple[str, str], int] = {}
+        for record in self._read():
+            batch_id = record["batch_id"]
+            if record["op"] == "delete":
+                batch = batches.get(batch_id)
+                if batch is None:
+                    batch = batches[batch_id] = JournalBatch(batch_id=batch_id, deleted_at=record["timestamp"])
+                size = record["file"].get("size", 0)
+                sizes[(batch_id, record["file"]["id"])] = size
+                batch.deleted_count += 1
+                batch.deleted_size += size
+            elif batch_id not in batches:
+                continue
+            elif record["op"] == "abort":
+                batches[batch_id].deleted_count -= 1
+                batches[batch_id].deleted_size -= sizes.get((batch_id, record["file_id"]), 0)
+            elif record["op"] == "restore":
+                batches[batch_id].restored_count += 1
+        return sorted(
+            (b for b in batches.values() if b.deleted_count > 0),
+            key=lambda b: b.deleted_at,
+            reverse=True,
+        )
+
+    def _pending_restore(self, batch_id: str, file_ids: Optional[List[str]]) -> List[FileInfo]:
+        pending: Dict[str, FileInfo] = {}
+        for record in self._read():
+            if record["batch_id"] != batch_id:
+                continue
+            if record["op"] == "delete":
+                file = FileInfo.model_validate(record["file"])
+                pending[file.id] = file
+            elif record["op"] in ("abort", "restore"):
+                pending.pop(record["file_id"], None)
+
+        if file_ids is not None:
+            wanted = set(file_ids)
+            return [f for f in pending.values() if f.id in wanted]
+        return list(pending.values())
+
+    async def _append_ops(self, op: str, batch_id: str, file_ids: List[str]) -> None:
+        timestamp = datetime.now(timezone.utc).isoformat()
+        await self._append(
+            [{"op": op, "batch_id": batch_id, "timestamp": timestamp, "file_id": file_id} for file_id in file_ids]
+        )
+
+    async def _append(self, records: List[dict]) -> None:
+        if records:
+            await asyncio.to_thread(self._write, records)
+
+    def _write(self, records: List[dict]) -> None:
+        lines = "".join(json.dumps(r) + "\n" for r in records)
+        with _write_lock:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            # Terminate a line torn by an earlier crash so it doesn't swallow
+            # the first new record
+            if self._ends_mid_line():
+                lines = "\n" + lines
+            with open(self._path, "a", encoding="utf-8") as fh:
+                fh.write(lines)
+                fh.flush()
+                os.fsync(fh.fileno())
+
+    def _ends_mid_line(self) -> bool:
+        try:
+            with open(self._path, "rb") as fh:
+                fh.seek(0, os.SEEK_END)
+                if fh.tell() == 0:
+                    return False
+                fh.seek(-1, os.SEEK_END)
+                return fh.read(1) != b"\n"
+        except FileNotFoundError:
+            return False
+
+    def _read(self) -> Iterator[dict]:
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, encoding="utf-8") as fh:
+            for line_no, line in enumerate(fh, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append can leave a truncated last line
+                    logger.warning("Skipping corrupt journal line %d in %s", line_no, self._path)
@@ -0,0 +1,102 @@
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+from app.models.schemas import FileInfo, KeepRules
+
+# Names produced by copy/paste or sync conflicts, e.g. "Copy of report.pdf",
+# "report (1).pdf", "report - Copy.pdf". The counter is capped at three digits so
+# year suffixes such as "Vacation (2019).jpg" are not mistaken for copies.
+_COPY_NAME_RE = re.compile(r"^copy of |\s\(\d{1,3}\)(\.[^.]*)?$| - copy(\.[^.]*)?$", re.IGNORECASE)
+
+
+class KeepRule(ABC):
+    """A single keep-copy preference.
+
+    Rules score a flat batch of files in one call; a higher score means the
+    file is a better candidate to keep.
+    """
+
+    @abstractmethod
+    def score(self, files: Sequence[FileInfo]) -> List[float]:
+        ...
+
+
+class PreferFolderRule(KeepRule):
+    def __init__(self, folder_path: str) -> None:
+        self._prefix = folder_path.rstrip("/") + "/"
+
+    def score(self, files: Sequence[FileInfo]) -> List[float]:
+        prefix = self._prefix
+        return [1.0 if f.path.startswith(prefix) else 0.0 for f in files]
+
+
+class AvoidCopyNamesRule(KeepRule):
+    def score(self, files: Sequence[FileInfo]) -> List[float]:
+        search = _COPY_NAME_RE.search
+        return [0.0 if search(f.name) else 1.0 for f in files]
+
+
+class PreferMimeTypeRule(KeepRule):
+    def __init__(self, mime_type: str) -> None:
+        self._mime_type = mime_type.lower()
+
+    def score(self, files: Sequence[FileInfo]) -> List[float]:
+        mime_type = self._mime_type
+        return [1.0 if (f.mime_type or "").lower() == mime_type else 0.0 for f in files]
+
+
+class ShortestPathRule(KeepRule):
+    def score(self, files: Sequence[FileInfo]) -> List[float]:
+        return [-float(len(f.path)) for f in files]
+
+
+class OldestRule(KeepRule):
+    def score(self, files: Sequence[FileInfo]) -> List[float]:
+        return [-f.last_modified.timestamp() for f in files]
+
+
+class KeepRuleEngine:
+    """Chooses the copy to keep in every duplicate group.
+
+    Rules are applied in priority order: a later rule only breaks ties left
+    by the earlier ones. The oldest file always acts as the final tie-breaker,
+    which matches the behaviour when no rules are configured.
+    """
+
+    def __init__(self, rules: Sequence[KeepRule]) -> None:
+        self._rules = list(rules) + [OldestRule()]
+
+    @classmethod
+    def from_config(cls, config: Optional[KeepRules]) -> "KeepRuleEngine":
+        rules: List[KeepRule] = []
+        if config:
+            if config.preferred_folder:
+                rules.append(PreferFolderRule(config.preferred_folder))
+            if config.avoid_copy_names:
+                rules.append(AvoidCopyNamesRule())
+            if config.preferred_mime_type:
+                rules.append(PreferMimeTypeRule(config.preferred_mime_type))
+            if config.prefer_shortest_path:
+                rules.append(ShortestPathRule())
+        return cls(rules)
+
+    def select_keep(self, groups: Sequence[Sequence[FileInfo]]) -> List[FileInfo]:
+        """Return the file to keep for each group, in the order given."""
+        flat: List[FileInfo] = [f for group in groups for f in group]
+        if not flat:
+            return []
+
+        # Score every file across all groups with each rule in one pass, then
+        # zip the columns into one lexicographic key per file
+        columns = [rule.score(flat) for rule in self._rules]
+        keys: List[Tuple[float, ...]] = list(zip(*columns))
+
+        keep: List[FileInfo] = []
+        offset = 0
+        for group in groups:
+            end = offset + len(group)
+            best = max(range(offset, end), key=keys.__getitem__)
+            keep.append(flat[best])
+            offset = end
+        return keep
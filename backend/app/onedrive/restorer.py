@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+import httpx
+
+from app.models.schemas import FileInfo
+
+logger = logging.getLogger(__name__)
+GRAPH_BASE = "https://graph.microsoft.com/v1.0"
+MAX_RETRY_ATTEMPTS = 6
+MAX_CONCURRENT_RESTORES = 8
+
+
+class OneDriveRestorer:
+    """Restores deleted items from the OneDrive recycle bin concurrently.
+
+    Graph's restore action only exists for OneDrive Personal; callers should
+    check ``get_drive_type()`` first.
+
+    All workers share one throttle window: when Graph answers 429, every
+    worker waits out the Retry-After period instead of piling on more requests.
+    """
+
+    def __init__(self, access_token: str, concurrency: int = MAX_CONCURRENT_RESTORES) -> None:
+        self._headers = {
+            "Authorization": f"Bearer {access_token}",
+            "ConsistencyLevel": "eventual",
+        }
+        self._concurrency = concurrency
+        self._throttled_until = 0.0
+
+    async def get_drive_type(self) -> str:
+        """Return the signed-in user's drive type ("personal", "business", ...)."""
+        async with httpx.AsyncClient(timeout=20) as client:
+            resp = await client.get(f"{GRAPH_BASE}/me/drive?$select=driveType", headers=self._headers)
+            resp.raise_for_status()
+            return resp.json().get("driveType", "")
+
+    async def restore_files(self, files: List[FileInfo]) -> AsyncIterator[Tuple[FileInfo, Optional[str]]]:
+        """Yield ``(file, error)`` for each file as its restore finishes.
+
+        ``error`` is None when the file was restored successfully.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for f in files:
+            queue.put_nowait(f)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async with httpx.AsyncClient(timeout=20) as client:
+
+            async def worker() -> None:
+                while True:
+                    try:
+                        f = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    error: Optional[str] = None
+                    try:
+                        await self._restore_with_backoff(client, f)
+                    except Exception as exc:
+                        logger.error("Failed to restore %s: %s", f.id, exc)
+                        error = str(exc)
+                    await results.put((f, error))
+
+            workers = [asyncio.create_task(worker()) for _ in range(min(self._concurrency, len(files)))]
+            try:
+                for _ in range(len(files)):
+                    yield await results.get()
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _restore_with_backoff(self, client: httpx.AsyncClient, file: FileInfo) -> None:
+        url = f"{GRAPH_BASE}/me/drive/items/{file.id}/restore"
+        delay = 1.0
+        for attempt in range(MAX_RETRY_ATTEMPTS):
+            wait = self._throttled_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            # No parentReference: Graph restores to the item's original folder,
+            # which still works if that folder has moved since the scan
+            resp = await client.post(url, headers=self._headers, json={})
+            if resp.status_code in (429, 503):
+                retry_after = float(resp.headers.get("Retry-After", delay))
+                logger.warning("Rate limited on restore; pausing all restores for %.1fs", retry_after)
+                self._throttled_until = max(self._throttled_until, time.monotonic() + retry_after)
+                delay = min(delay * 2, 60)
+                continue
+            if resp.status_code in (200, 201):
+                return
+            if resp.status_code == 404:
+                raise RuntimeError("Item not found in recycle bin")
+            resp.raise_for_status()
+        raise RuntimeError(f"Exceeded retry limit restoring {file.id}")
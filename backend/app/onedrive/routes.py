@@ -1,7 +1,8 @@
 import logging
-from typing import Dict, List, Optional, Set
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
 
 from app.auth.routes import require_session
 from app.models.schemas import (
@@ -11,10 +12,17 @@ from app.models.schemas import (
     DuplicateGroup,
     DuplicatesFilter,
     FileInfo,
+    JournalBatch,
+    KeepRules,
+    RestoreRequest,
+    RestoreStatus,
     ScanStatus,
 )
-from app.onedrive.dedup import DuplicateDetector
+from app.onedrive.cache import filter_key, next_generation, result_cache
+from app.onedrive.dedup import DuplicateDetector, KeepIndex
 from app.onedrive.deleter import OneDriveDeleter
+from app.onedrive.journal import DeleteJournal
+from app.onedrive.restorer import OneDriveRestorer
 from app.onedrive.scanner import OneDriveScanner
 
 logger = logging.getLogger(__name__)
@@ -22,6 +30,15 @@ router = APIRouter()
 
 # In-memory store keyed by session cookie value (or "default" for simplicity)
 scan_store: Dict[str, dict] = {}
+# Keep-copy rules outlive individual scans, so they are stored separately
+keep_rules_store: Dict[str, KeepRules] = {}
+restore_store: Dict[str, RestoreStatus] = {}
+
+# Restored IDs are flushed to the journal in chunks rather than one fsync per file
+JOURNAL_FLUSH_EVERY = 100
+
+_duplicates_adapter = TypeAdapter(List[DuplicateGroup])
+_stats_adapter = TypeAdapter(DashboardStats)
 
 
 def _store_key(request: Request) -> str:
@@ -29,25 +46,85 @@ def _store_key(request: Request) -> str:
     return request.cookies.get("session", "default")[:64]
 
 
+def _journal(session: dict, store_key: str) -> DeleteJournal:
+    """Open the delete journal for the signed-in user.
+
+    Journals are keyed by the account's object ID so they survive re-login;
+    the session store key is only a fallback.
+    """
+    claims = session.get("id_token_claims") or {}
+    return DeleteJournal(claims.get("oid") or store_key)
+
+
+def _keep_index(entry: dict, rules: Optional[KeepRules]) -> KeepIndex:
+    """Return the cached keep index for a store entry, building it if needed.
+
+    The index is only cached once the scan has finished, since the file list
+    is still growing while a scan is running.
+    """
+    index: Optional[KeepIndex] = entry.get("keep_index")
+    if index is None:
+        index = KeepIndex(DuplicateDetector.find_duplicates(entry["files"], None, rules))
+        if entry["status"].status == "complete":
+            entry["keep_index"] = index
+    return index
+
+
+def _bump_generation(entry: dict) -> None:
+    """Mark a store entry as changed so cached results for it go stale."""
+    entry["generation"] = next_generation()
+
+
+def _cached_json(
+    request: Request,
+    store_key: str,
+    entry: Optional[dict],
+    kind: str,
+    params: Tuple[Hashable, ...],
+    adapter: TypeAdapter,
+    build: Callable[[], Any],
+) -> Response:
+    """Serve a result from the per-generation cache, honouring If-None-Match."""
+    generation = entry.get("generation", 0) if entry else 0
+    key = (store_key, generation, kind) + params
+    etag = result_cache.etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+
+    body = result_cache.get(key)
+    if body is None:
+        body = adapter.dump_json(build())
+        # Results change with every file while scanning; don't fill the cache with them
+        if not entry or entry["status"].status != "scanning":
+            result_cache.put(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 async def _run_scan(access_token: str, store_key: str) -> None:
     scanner = OneDriveScanner(access_token)
     files: List[FileInfo] = []
-    scan_store[store_key] = {"status": ScanStatus(status="scanning"), "files": files}
+    entry = {"status": ScanStatus(status="scanning"), "files": files, "generation": next_generation()}
+    scan_store[store_key] = entry
     try:
         async for file in scanner.scan_all_files():
             files.append(file)
-            scan_store[store_key]["status"] = scanner.get_scan_progress()
-        scan_store[store_key]["status"] = ScanStatus(
+            entry["status"] = scanner.get_scan_progress()
+            _bump_generation(entry)
+        entry["status"] = ScanStatus(
             status="complete",
             files_scanned=len(files),
         )
     except Exception as exc:
         logger.error("Background scan error: %s", exc)
-        scan_store[store_key]["status"] = ScanStatus(
+        entry["status"] = ScanStatus(
             status="error",
             files_scanned=len(files),
             message=str(exc),
         )
+    _bump_generation(entry)
 
 
 @router.post("/scan", response_model=ScanStatus)
@@ -60,7 +137,8 @@ async def start_scan(request: Request, background_tasks: BackgroundTasks) -> Sca
         return current["status"]
 
     initial_status = ScanStatus(status="scanning", files_scanned=0)
-    scan_store[store_key] = {"status": initial_status, "files": []}
+    scan_store[store_key] = {"status": initial_status, "files": [], "generation": next_generation()}
+    result_cache.invalidate(store_key)
     background_tasks.add_task(_run_scan, session["access_token"], store_key)
     return initial_status
 
@@ -81,29 +159,59 @@ async def get_duplicates(
     min_size: Optional[int] = Query(default=0),
     extensions: Optional[str] = Query(default=None, description="Comma-separated list, e.g. jpg,png"),
     folder_path: Optional[str] = Query(default=None),
-) -> List[DuplicateGroup]:
+) -> Response:
     require_session(request)
     store_key = _store_key(request)
     entry = scan_store.get(store_key)
-    if not entry or not entry.get("files"):
-        return []
+    files: List[FileInfo] = entry["files"] if entry else []
 
     ext_list: Optional[List[str]] = [e.strip() for e in extensions.split(",")] if extensions else None
     filters = DuplicatesFilter(min_size=min_size, extensions=ext_list, folder_path=folder_path)
-    return DuplicateDetector.find_duplicates(entry["files"], filters)
+    rules = keep_rules_store.get(store_key)
+    return _cached_json(
+        request,
+        store_key,
+        entry,
+        "duplicates",
+        filter_key(filters, rules),
+        _duplicates_adapter,
+        lambda: DuplicateDetector.find_duplicates(files, filters, rules) if files else [],
+    )
 
 
 @router.get("/stats", response_model=DashboardStats)
-async def get_stats(request: Request) -> DashboardStats:
+async def get_stats(request: Request) -> Response:
     require_session(request)
     store_key = _store_key(request)
     entry = scan_store.get(store_key)
     files: List[FileInfo] = entry["files"] if entry else []
-    duplicates = DuplicateDetector.find_duplicates(files, None)
-    stats = DuplicateDetector.get_stats(files, duplicates)
+    rules = keep_rules_store.get(store_key)
+
+    def build() -> DashboardStats:
+        duplicates = DuplicateDetector.find_duplicates(files, None, rules)
+        stats = DuplicateDetector.get_stats(files, duplicates)
+        if entry:
+            stats.scan_status = entry["status"]
+        return stats
+
+    return _cached_json(request, store_key, entry, "stats", filter_key(None, rules), _stats_adapter, build)
+
+
+@router.get("/keep-rules", response_model=KeepRules)
+async def get_keep_rules(request: Request) -> KeepRules:
+    require_session(request)
+    return keep_rules_store.get(_store_key(request), KeepRules())
+
+
+@router.put("/keep-rules", response_model=KeepRules)
+async def set_keep_rules(request: Request, body: KeepRules) -> KeepRules:
+    require_session(request)
+    store_key = _store_key(request)
+    keep_rules_store[store_key] = body
+    entry = scan_store.get(store_key)
     if entry:
-        stats.scan_status = entry["status"]
-    return stats
+        entry.pop("keep_index", None)
+    return body
 
 
 @router.post("/delete", response_model=DeleteResult)
@@ -113,26 +221,139 @@ async def delete_files(request: Request, body: DeleteRequest) -> DeleteResult:
     entry = scan_store.get(store_key)
     files: List[FileInfo] = entry["files"] if entry else []
 
-    # Determine which IDs are the last surviving copy of their hash
-    duplicates = DuplicateDetector.find_duplicates(files, None)
-    all_duplicate_ids = {f.id for g in duplicates for f in g.files}
-    suggested_keep_ids = {g.suggested_keep_id for g in duplicates}
-
-    # Build set of IDs we must protect: any file NOT in a duplicate group is unique,
-    # or is the last copy (suggested_keep) unless the user explicitly included it
+    # If the user wants to delete ALL copies of a hash, protect the suggested one
     protected: Set[str] = set()
-    for group in duplicates:
-        non_deleted = [f for f in group.files if f.id not in body.file_ids]
-        if len(non_deleted) == 0:
-            # User wants to delete ALL copies – protect the suggested one
-            protected.add(group.suggested_keep_id)
+    if entry:
+        protected = _keep_index(entry, keep_rules_store.get(store_key)).protected_ids(body.file_ids)
+
+    # Journal the files before deleting them so a crash mid-delete still
+    # leaves a record of everything that may have been removed. Files missing
+    # from the scan (e.g. after a backend restart) cannot be journaled, so
+    # they are refused rather than deleted without a way back.
+    requested = set(body.file_ids) - protected
+    intended = [f for f in files if f.id in requested]
+    journaled_ids = {f.id for f in intended}
+    unjournaled = [i for i in dict.fromkeys(body.file_ids) if i in requested and i not in journaled_ids]
+    if unjournaled:
+        logger.warning("Refusing to delete %d files that are not in the scan", len(unjournaled))
+    journal = _journal(session, store_key)
+    try:
+        batch_id = await journal.record_deleting(intended)
+    except OSError as exc:
+        logger.error("Could not write delete journal: %s", exc)
+        raise HTTPException(status_code=503, detail="Could not write delete journal; nothing was deleted")
 
     deleter = OneDriveDeleter(session["access_token"])
-    result = await deleter.delete_files(body.file_ids, safe_ids=protected)
+    result = await deleter.delete_files(
+        [i for i in body.file_ids if i in journaled_ids or i in protected],
+        safe_ids=protected,
+    )
+    result.failed.extend({"id": i, "error": "Not in the current scan; rescan before deleting"} for i in unjournaled)
+    result.batch_id = batch_id
+    deleted_set = set(result.deleted)
 
     # Refresh in-memory store
     if entry:
-        deleted_set = set(result.deleted)
-        entry["files"] = [f for f in files if f.id not in deleted_set]
+        entry["files"] = [f for f in entry["files"] if f.id not in deleted_set]
+        _bump_generation(entry)
+        index: Optional[KeepIndex] = entry.get("keep_index")
+        if index is not None and not index.discard(deleted_set):
+            del entry["keep_index"]
+
+    if batch_id:
+        aborted = [f.id for f in intended if f.id not in deleted_set]
+        try:
+            await journal.record_aborted(batch_id, aborted)
+        except OSError as exc:
+            # Aborted files stay pending in the journal; restoring them just fails harmlessly
+            logger.error("Could not record aborted deletes in journal: %s", exc)
+            result.journal_error = str(exc)
 
     return result
+
+
+async def _flush_restored(journal: DeleteJournal, status: RestoreStatus, file_ids: List[str]) -> None:
+    try:
+        await journal.record_restored(status.batch_id, file_ids)
+    except OSError as exc:
+        logger.error("Could not record restores in journal: %s", exc)
+        status.message = f"Restored files could not be journaled: {exc}"
+
+
+async def _run_restore(
+    restorer: OneDriveRestorer, store_key: str, journal: DeleteJournal, files: List[FileInfo]
+) -> None:
+    status = restore_store[store_key]
+    # Only merge restored files back into the scan that was current when we started
+    start_entry = scan_store.get(store_key)
+    pending_ids: List[str] = []
+    restored_files: List[FileInfo] = []
+    try:
+        async for file, error in restorer.restore_files(files):
+            if error:
+                status.failed.append({"id": file.id, "error": error})
+                continue
+            status.restored += 1
+            pending_ids.append(file.id)
+            restored_files.append(file)
+            if len(pending_ids) >= JOURNAL_FLUSH_EVERY:
+                await _flush_restored(journal, status, pending_ids)
+                pending_ids = []
+        status.status = "complete"
+    except Exception as exc:
+        logger.error("Background restore error: %s", exc)
+        status.status = "error"
+        status.message = str(exc)
+    finally:
+        if pending_ids:
+            await _flush_restored(journal, status, pending_ids)
+
+    # Put restored files back into the scan results, unless a new scan has
+    # replaced that entry or is still collecting files (it will find them itself)
+    entry = scan_store.get(store_key)
+    if entry is not None and entry is start_entry and entry["status"].status != "scanning" and restored_files:
+        existing = {f.id for f in entry["files"]}
+        entry["files"].extend(f for f in restored_files if f.id not in existing)
+        entry.pop("keep_index", None)
+        _bump_generation(entry)
+
+
+@router.get("/journal", response_model=List[JournalBatch])
+async def list_journal(request: Request) -> List[JournalBatch]:
+    session = require_session(request)
+    return await _journal(session, _store_key(request)).list_batches()
+
+
+@router.post("/restore", response_model=RestoreStatus)
+async def start_restore(request: Request, body: RestoreRequest, background_tasks: BackgroundTasks) -> RestoreStatus:
+    session = require_session(request)
+    store_key = _store_key(request)
+
+    current = restore_store.get(store_key)
+    if current and current.status == "restoring":
+        return current
+
+    journal = _journal(session, store_key)
+    files = await journal.pending_restore(body.batch_id, body.file_ids)
+    if not files:
+        raise HTTPException(status_code=404, detail="No deleted files pending restore in this batch")
+
+    restorer = OneDriveRestorer(session["access_token"])
+    drive_type = await restorer.get_drive_type()
+    if drive_type != "personal":
+        raise HTTPException(
+            status_code=422,
+            detail="Restoring from the recycle bin is only supported for OneDrive Personal; "
+            "restore work or school files from the OneDrive recycle bin instead",
+        )
+
+    status = RestoreStatus(status="restoring", batch_id=body.batch_id, total=len(files))
+    restore_store[store_key] = status
+    background_tasks.add_task(_run_restore, restorer, store_key, journal, files)
+    return status
+
+
+@router.get("/restore/status", response_model=RestoreStatus)
+async def restore_status(request: Request) -> RestoreStatus:
+    require_session(request)
+    return restore_store.get(_store_key(request), RestoreStatus(status="idle"))